@@ -1,7 +1,7 @@
 import Foundation
 import HealthKit
 
-class HealthKitManager: ObservableObject {
+final class HealthKitManager: ObservableObject {
     private let healthStore = HKHealthStore()
     @Published var isAuthorized = false
     @Published var authorizationStatus: String = "Not Determined"
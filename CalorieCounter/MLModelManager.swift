@@ -3,18 +3,16 @@ import UIKit
 import CoreML
 import Vision
 
-class MLModelManager: ObservableObject {
+final class MLModelManager: ObservableObject {
     @Published var isProcessing = false
     @Published var lastResult: FoodRecognitionResult?
     @Published var errorMessage: String?
     
-    private var openAIService: OpenAIService?
+    private var openAIAPIKey: String?
     
     init() {
-        // Initialize OpenAI service with API key
-        if let apiKey = getOpenAIAPIKey() {
-            openAIService = OpenAIService(apiKey: apiKey)
-        }
+        // Load the OpenAI API key once; the service is built per analysis
+        openAIAPIKey = getOpenAIAPIKey()
     }
     
     func analyzeFood(image: UIImage) async -> FoodRecognitionResult? {
@@ -30,7 +28,11 @@ class MLModelManager: ObservableObject {
         }
         
         // Try OpenAI service first, fallback to simulation if not available
-        if let service = openAIService {
+        if let apiKey = openAIAPIKey {
+            // Build the service per analysis so a model chosen in Settings applies right away;
+            // the URL session and response cache are shared, so this is cheap
+            let service = OpenAIService(apiKey: apiKey, model: SettingsManager.storedOpenAIModel())
+            
             do {
                 let result = try await service.analyzeFood(image: image)
                 await MainActor.run {
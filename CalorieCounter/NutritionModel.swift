@@ -6,6 +6,14 @@ let CARBOHYDRATE_CALORIES_PER_GRAM = 4.0 // Carbohydrates: 4 kcal/g
 let FAT_CALORIES_PER_GRAM = 9.0          // Fats: 9 kcal/g
 let FIBER_CALORIES_PER_GRAM = 2.0        // Fiber: 2 kcal/g
 
+// Caloric values per gram in macronutrient vector order (protein, carbohydrates, fats, fiber)
+let MACRO_CALORIES_PER_GRAM = SIMD4<Double>(
+    PROTEIN_CALORIES_PER_GRAM,
+    CARBOHYDRATE_CALORIES_PER_GRAM,
+    FAT_CALORIES_PER_GRAM,
+    FIBER_CALORIES_PER_GRAM
+)
+
 /// Represents nutritional information for a food item
 struct NutritionData: Codable, Identifiable {
     let id = UUID()
@@ -26,10 +34,35 @@ struct NutritionData: Codable, Identifiable {
         self.foodName = foodName
         
         // Calculate calories using defined constants
-        self.calories = (protein * PROTEIN_CALORIES_PER_GRAM) +
-                       (carbohydrates * CARBOHYDRATE_CALORIES_PER_GRAM) +
-                       (fats * FAT_CALORIES_PER_GRAM) +
-                       (fiber * FIBER_CALORIES_PER_GRAM)
+        self.calories = NutritionData.calories(for: SIMD4(protein, carbohydrates, fats, fiber))
+    }
+    
+    /// Macronutrient grams as a vector in (protein, carbohydrates, fats, fiber) order
+    var macros: SIMD4<Double> {
+        SIMD4(protein, carbohydrates, fats, fiber)
+    }
+    
+    /// Calories for a macronutrient vector, computed as a single vector multiply and sum
+    static func calories(for macros: SIMD4<Double>) -> Double {
+        (macros * MACRO_CALORIES_PER_GRAM).sum()
+    }
+    
+    /// Combines several food items, such as the components of a meal, into one entry
+    static func total(of items: [NutritionData], foodName: String? = nil) -> NutritionData {
+        let macros = items.reduce(SIMD4<Double>.zero) { $0 + $1.macros }
+        
+        return NutritionData(
+            protein: macros[0],
+            carbohydrates: macros[1],
+            fats: macros[2],
+            fiber: macros[3],
+            foodName: foodName
+        )
+    }
+    
+    /// Field-wise sum of two items; the combined entry has no food name
+    static func + (lhs: NutritionData, rhs: NutritionData) -> NutritionData {
+        total(of: [lhs, rhs])
     }
 }
 
@@ -1,10 +1,67 @@
 import Foundation
 import UIKit
+import CryptoKit
 
 /// Service for interacting with OpenAI's Vision API to extract nutrition information from food images
-class OpenAIService {
+final class OpenAIService {
     private let apiKey: String
     private let baseURL = "https://api.openai.com/v1/chat/completions"
+    private let session: URLSession
+    private let model: String
+    private let cachesResponses: Bool
+    private let streamsResponses: Bool
+    private let decoder = JSONDecoder()
+    
+    /// Longest edge, in pixels, of the image sent to the vision model.
+    /// The API downsamples larger images anyway, so uploading them only costs bandwidth.
+    private static let maxImageDimension: CGFloat = 1024
+    
+    /// Vision-capable chat model used when no model is specified
+    static let defaultModel = "gpt-4-vision-preview"
+    
+    /// Status codes that indicate rate limiting or a transient server failure
+    private static let retryableStatusCodes: Set<Int> = [429, 500, 502, 503, 504]
+    private static let maxRetryAttempts = 4
+    private static let baseRetryDelay: TimeInterval = 0.5
+    private static let maxRetryDelay: TimeInterval = 30
+    
+    /// Instructions sent alongside every image; the model must answer with JSON only
+    private static let nutritionPrompt = """
+    Analyze this food image and extract the macro nutrient information. Return ONLY a valid JSON object with the following structure:
+    
+    {
+      "protein": <grams_of_protein_as_number>,
+      "carbohydrates": <grams_of_carbohydrates_as_number>,
+      "fats": <grams_of_fats_as_number>,
+      "fiber": <grams_of_fiber_as_number>,
+      "foodName": "<identified_food_name>",
+      "confidence": <confidence_score_between_0_and_1>
+    }
+    
+    Estimate the portion size based on visual cues in the image. Provide realistic macro nutrient values in grams for the visible portion. If you cannot clearly identify the food or estimate nutrition, return confidence < 0.5. Do not include any text outside of the JSON object.
+    """
+    
+    /// Session shared by all service instances so requests reuse warm
+    /// keep-alive connections to the API instead of repeating the TLS handshake
+    static let defaultSession: URLSession = {
+        let configuration = URLSessionConfiguration.default
+        configuration.httpMaximumConnectionsPerHost = 4
+        configuration.timeoutIntervalForRequest = 60
+        configuration.waitsForConnectivity = false
+        return URLSession(configuration: configuration)
+    }()
+    
+    /// Whether the connection warm-up request has already been sent in this process
+    private static var hasWarmedUpConnection = false
+    private static let warmUpLock = NSLock()
+    
+    /// Raw model replies keyed by a SHA-256 hash of the request body, so re-analyzing
+    /// the same image with the same prompt and parameters skips the network round-trip
+    private static let responseCache: NSCache<NSString, NSString> = {
+        let cache = NSCache<NSString, NSString>()
+        cache.countLimit = 32
+        return cache
+    }()
     
     /// Response structure from OpenAI API
     private struct OpenAIResponse: Codable {
@@ -19,6 +76,19 @@ class OpenAIService {
         }
     }
     
+    /// Server-sent event chunk from OpenAI's streaming API
+    private struct OpenAIStreamChunk: Codable {
+        let choices: [Choice]
+        
+        struct Choice: Codable {
+            let delta: Delta
+            
+            struct Delta: Codable {
+                let content: String?
+            }
+        }
+    }
+    
     /// Expected JSON structure for nutrition data from OpenAI
     private struct OpenAINutritionResponse: Codable {
         let protein: Double
@@ -29,16 +99,33 @@ class OpenAIService {
         let confidence: Double
     }
     
-    init(apiKey: String) {
+    init(apiKey: String,
+         model: String = OpenAIService.defaultModel,
+         session: URLSession = OpenAIService.defaultSession,
+         cachesResponses: Bool = true,
+         streamsResponses: Bool = true) {
         self.apiKey = apiKey
+        self.model = model
+        self.session = session
+        self.cachesResponses = cachesResponses
+        self.streamsResponses = streamsResponses
     }
     
     /// Analyzes a food image using OpenAI's vision model and extracts macro nutrients
     /// - Parameter image: The food image to analyze
     /// - Returns: FoodRecognitionResult with extracted nutrition data
     func analyzeFood(image: UIImage) async throws -> FoodRecognitionResult {
-        // Convert image to base64
-        guard let imageData = image.jpegData(compressionQuality: 0.8) else {
+        // On the first call, open the connection to the API while the image is prepared.
+        // The response cache is per process and still empty then, so this never
+        // precedes a cache hit; it is cancelled along with this call.
+        async let _ = warmUpConnectionIfNeeded()
+        
+        // Resize and JPEG-encode off the caller's executor, then convert to base64
+        let encodedImage = await Task.detached(priority: .userInitiated) {
+            OpenAIService.encodeImage(image)
+        }.value
+        
+        guard let imageData = encodedImage else {
             throw OpenAIError.imageProcessingError
         }
         
@@ -46,39 +133,95 @@ class OpenAIService {
         
         // Create the request payload
         let payload = createRequestPayload(base64Image: base64Image)
+        let body = try serializePayload(payload)
+        let cacheKey = cachesResponses ? Self.cacheKey(for: body) : nil
+        
+        // Reuse an earlier reply for an identical request
+        if let cacheKey = cacheKey,
+           let cachedContent = Self.responseCache.object(forKey: cacheKey) {
+            return try parseNutritionResponse(cachedContent as String)
+        }
         
         // Make API request
-        let response = try await makeAPIRequest(payload: payload)
+        let content = try await makeAPIRequest(body: body)
         
-        // Parse the response
-        return try parseNutritionResponse(response)
+        // Parse the response, caching it only once it has produced valid nutrition data
+        let result = try parseNutritionResponse(content)
+        if let cacheKey = cacheKey {
+            Self.responseCache.setObject(content as NSString, forKey: cacheKey)
+        }
+        return result
     }
     
-    private func createRequestPayload(base64Image: String) -> [String: Any] {
-        let prompt = """
-        Analyze this food image and extract the macro nutrient information. Return ONLY a valid JSON object with the following structure:
+    /// Encodes the image as JPEG, downscaling it first if it exceeds `maxImageDimension`
+    private static func encodeImage(_ image: UIImage) -> Data? {
+        let pixelWidth = image.size.width * image.scale
+        let pixelHeight = image.size.height * image.scale
+        let longestSide = max(pixelWidth, pixelHeight)
+        
+        // Small images are encoded directly without an extra resize pass
+        guard longestSide > Self.maxImageDimension else {
+            return image.jpegData(compressionQuality: 0.8)
+        }
+        
+        let ratio = Self.maxImageDimension / longestSide
+        let targetSize = CGSize(width: (pixelWidth * ratio).rounded(), height: (pixelHeight * ratio).rounded())
         
-        {
-          "protein": <grams_of_protein_as_number>,
-          "carbohydrates": <grams_of_carbohydrates_as_number>,
-          "fats": <grams_of_fats_as_number>,
-          "fiber": <grams_of_fiber_as_number>,
-          "foodName": "<identified_food_name>",
-          "confidence": <confidence_score_between_0_and_1>
+        // Prefer UIKit's thumbnail path, which decodes straight to the target size
+        if let thumbnail = image.preparingThumbnail(of: targetSize) {
+            return thumbnail.jpegData(compressionQuality: 0.8)
         }
         
-        Estimate the portion size based on visual cues in the image. Provide realistic macro nutrient values in grams for the visible portion. If you cannot clearly identify the food or estimate nutrition, return confidence < 0.5. Do not include any text outside of the JSON object.
-        """
+        // Fall back to redrawing the image when no thumbnail can be produced
+        let format = UIGraphicsImageRendererFormat.default()
+        format.scale = 1
+        format.opaque = true
         
-        return [
-            "model": "gpt-4-vision-preview",
+        let resized = UIGraphicsImageRenderer(size: targetSize, format: format).image { _ in
+            image.draw(in: CGRect(origin: .zero, size: targetSize))
+        }
+        
+        return resized.jpegData(compressionQuality: 0.8)
+    }
+    
+    /// Sends a lightweight HEAD request, once per process, so the TCP and TLS handshakes with
+    /// the API host overlap with image encoding; the pooled connection is then reused for the
+    /// real request and by every later call
+    private func warmUpConnectionIfNeeded() async {
+        let isFirstWarmUp = Self.warmUpLock.withLock { () -> Bool in
+            defer { Self.hasWarmedUpConnection = true }
+            return !Self.hasWarmedUpConnection
+        }
+        
+        guard isFirstWarmUp, let url = URL(string: baseURL) else {
+            return
+        }
+        
+        var request = URLRequest(url: url)
+        request.httpMethod = "HEAD"
+        _ = try? await session.data(for: request)
+    }
+    
+    /// Clears all cached model replies
+    static func clearResponseCache() {
+        responseCache.removeAllObjects()
+    }
+    
+    private static func cacheKey(for body: Data) -> NSString {
+        let digest = SHA256.hash(data: body)
+        return digest.map { String(format: "%02x", $0) }.joined() as NSString
+    }
+    
+    private func createRequestPayload(base64Image: String) -> [String: Any] {
+        var payload: [String: Any] = [
+            "model": model,
             "messages": [
                 [
                     "role": "user",
                     "content": [
                         [
                             "type": "text",
-                            "text": prompt
+                            "text": Self.nutritionPrompt
                         ],
                         [
                             "type": "image_url",
@@ -92,9 +235,27 @@ class OpenAIService {
             "max_tokens": 300,
             "temperature": 0.1
         ]
+        
+        if streamsResponses {
+            payload["stream"] = true
+        }
+        
+        return payload
     }
     
-    private func makeAPIRequest(payload: [String: Any]) async throws -> OpenAIResponse {
+    private func serializePayload(_ payload: [String: Any]) throws -> Data {
+        do {
+            // Sorted keys keep the body byte-for-byte stable so it can serve as a cache key.
+            // Base64 image data is full of "/" characters; leaving them unescaped keeps
+            // the serializer from growing the largest field in the body.
+            return try JSONSerialization.data(withJSONObject: payload, options: [.sortedKeys, .withoutEscapingSlashes])
+        } catch {
+            throw OpenAIError.serializationError
+        }
+    }
+    
+    /// Sends the request and returns the model's reply text
+    private func makeAPIRequest(body: Data) async throws -> String {
         guard let url = URL(string: baseURL) else {
             throw OpenAIError.invalidURL
         }
@@ -103,44 +264,126 @@ class OpenAIService {
         request.httpMethod = "POST"
         request.setValue("Bearer \(apiKey)", forHTTPHeaderField: "Authorization")
         request.setValue("application/json", forHTTPHeaderField: "Content-Type")
+        request.httpBody = body
         
-        do {
-            request.httpBody = try JSONSerialization.data(withJSONObject: payload)
-        } catch {
-            throw OpenAIError.serializationError
+        if streamsResponses {
+            return try await streamContent(for: request)
         }
         
-        let (data, response) = try await URLSession.shared.data(for: request)
-        
-        guard let httpResponse = response as? HTTPURLResponse else {
-            throw OpenAIError.networkError
+        let (data, httpResponse) = try await withRetries {
+            try await self.session.data(for: request)
         }
         
         guard httpResponse.statusCode == 200 else {
             throw OpenAIError.apiError(statusCode: httpResponse.statusCode)
         }
         
+        let response: OpenAIResponse
         do {
-            return try JSONDecoder().decode(OpenAIResponse.self, from: data)
+            response = try decoder.decode(OpenAIResponse.self, from: data)
         } catch {
             throw OpenAIError.decodingError
         }
+        
+        guard let content = response.choices.first?.message.content else {
+            throw OpenAIError.emptyResponse
+        }
+        
+        return content
     }
     
-    private func parseNutritionResponse(_ response: OpenAIResponse) throws -> FoodRecognitionResult {
-        guard let content = response.choices.first?.message.content else {
+    /// Reads the reply as server-sent events, accumulating content deltas as they arrive.
+    /// Stops as soon as a complete nutrition object has been received rather than waiting
+    /// for the rest of the stream.
+    private func streamContent(for request: URLRequest) async throws -> String {
+        let (bytes, httpResponse) = try await withRetries {
+            try await self.session.bytes(for: request)
+        }
+        
+        guard httpResponse.statusCode == 200 else {
+            throw OpenAIError.apiError(statusCode: httpResponse.statusCode)
+        }
+        
+        var content = ""
+        
+        for try await line in bytes.lines {
+            guard line.hasPrefix("data: ") else {
+                continue
+            }
+            
+            let event = line.dropFirst("data: ".count)
+            if event == "[DONE]" {
+                break
+            }
+            
+            guard let chunk = try? decoder.decode(OpenAIStreamChunk.self, from: Data(event.utf8)),
+                  let delta = chunk.choices.first?.delta.content else {
+                continue
+            }
+            
+            content += delta
+            
+            // Only a closing brace can complete the object, so skip the check otherwise
+            if delta.contains("}"), let candidate = findJSONPatterns(in: content).last,
+               isValidNutritionJSON(candidate) {
+                break
+            }
+        }
+        
+        guard !content.isEmpty else {
             throw OpenAIError.emptyResponse
         }
         
+        return content
+    }
+    
+    /// Runs `operation`, backing off and retrying on rate limiting and transient server errors.
+    /// Returns the first response that is not retried, whatever its status code.
+    private func withRetries<T>(_ operation: () async throws -> (T, URLResponse)) async throws -> (T, HTTPURLResponse) {
+        var attempt = 0
+        
+        while true {
+            let (result, response) = try await operation()
+            
+            guard let httpResponse = response as? HTTPURLResponse else {
+                throw OpenAIError.networkError
+            }
+            
+            if Self.retryableStatusCodes.contains(httpResponse.statusCode) && attempt < Self.maxRetryAttempts {
+                let delay = Self.retryDelay(forAttempt: attempt, response: httpResponse)
+                try await Task.sleep(nanoseconds: UInt64(delay * 1_000_000_000))
+                attempt += 1
+                continue
+            }
+            
+            return (result, httpResponse)
+        }
+    }
+    
+    /// Delay before the next retry: the server's Retry-After value when it is a valid number
+    /// of seconds, otherwise exponential backoff, plus random jitter so clients do not retry
+    /// in lockstep. Always finite and between 0 and `maxRetryDelay` plus jitter.
+    static func retryDelay(forAttempt attempt: Int, response: HTTPURLResponse) -> TimeInterval {
+        let backoff = baseRetryDelay * pow(2, Double(attempt))
+        
+        var delay = backoff
+        if let retryAfterValue = response.value(forHTTPHeaderField: "Retry-After"),
+           let retryAfter = TimeInterval(retryAfterValue.trimmingCharacters(in: .whitespaces)),
+           retryAfter.isFinite, retryAfter >= 0 {
+            delay = retryAfter
+        }
+        
+        return max(0, min(delay, maxRetryDelay)) + Double.random(in: 0...0.3)
+    }
+    
+    private func parseNutritionResponse(_ content: String) throws -> FoodRecognitionResult {
         // Try to extract and validate JSON from the response
         let jsonString = extractJSON(from: content)
         
-        guard let jsonData = jsonString.data(using: .utf8) else {
-            throw OpenAIError.invalidJSONResponse
-        }
+        let jsonData = Data(jsonString.utf8)
         
         do {
-            let nutritionResponse = try JSONDecoder().decode(OpenAINutritionResponse.self, from: jsonData)
+            let nutritionResponse = try decoder.decode(OpenAINutritionResponse.self, from: jsonData)
             
             // Additional validation of decoded values
             try validateNutritionValues(nutritionResponse)
@@ -222,20 +465,22 @@ class OpenAIService {
     
     /// Finds potential JSON patterns in text by looking for balanced braces
     /// Returns array of candidate JSON strings ordered by likelihood
-    private func findJSONPatterns(in text: String) -> [String] {
+    /// Internal rather than private so the scan can be unit tested
+    func findJSONPatterns(in text: String) -> [String] {
         var candidates: [String] = []
         var braceCount = 0
         var startIndex: String.Index? = nil
         
-        for (i, char) in text.enumerated() {
-            let idx = text.index(text.startIndex, offsetBy: i)
+        // Walk the string's own indices so the scan stays a single linear pass
+        for idx in text.indices {
+            let char = text[idx]
             
             if char == "{" {
                 if braceCount == 0 {
                     startIndex = idx
                 }
                 braceCount += 1
-            } else if char == "}" {
+            } else if char == "}" && braceCount > 0 {
                 braceCount -= 1
                 if braceCount == 0, let start = startIndex {
                     let candidate = String(text[start...idx])
@@ -248,11 +493,19 @@ class OpenAIService {
         return candidates
     }
     
+    /// Fields every nutrition reply must contain, paired with whether the value is numeric
+    private static let requiredNutritionFields: [(name: String, isNumeric: Bool)] = [
+        ("protein", true),
+        ("carbohydrates", true),
+        ("fats", true),
+        ("fiber", true),
+        ("foodName", false),
+        ("confidence", true)
+    ]
+    
     /// Validates that a JSON string contains the expected nutrition data structure
     private func isValidNutritionJSON(_ jsonString: String) -> Bool {
-        guard let jsonData = jsonString.data(using: .utf8) else {
-            return false
-        }
+        let jsonData = Data(jsonString.utf8)
         
         do {
             // Try to parse as JSON object
@@ -260,29 +513,20 @@ class OpenAIService {
                 return false
             }
             
-            // Validate required fields exist and are of correct type
-            let requiredFields = ["protein", "carbohydrates", "fats", "fiber", "foodName", "confidence"]
-            
-            for field in requiredFields {
-                guard jsonObject[field] != nil else {
+            // Validate required fields exist and are of correct type, looking each one up once
+            for (field, isNumeric) in Self.requiredNutritionFields {
+                guard let value = jsonObject[field] else {
                     return false
                 }
-            }
-            
-            // Validate numeric fields are actually numbers
-            let numericFields = ["protein", "carbohydrates", "fats", "fiber", "confidence"]
-            for field in numericFields {
-                guard let value = jsonObject[field], 
-                      (value is Double || value is Int || value is NSNumber) else {
+                
+                let hasExpectedType = isNumeric
+                    ? (value is Double || value is Int || value is NSNumber)
+                    : value is String
+                guard hasExpectedType else {
                     return false
                 }
             }
             
-            // Validate foodName is a string
-            guard jsonObject["foodName"] is String else {
-                return false
-            }
-            
             // Validate confidence is in valid range (0.0 to 1.0)
             if let confidence = jsonObject["confidence"] as? Double {
                 guard confidence >= 0.0 && confidence <= 1.0 else {
@@ -291,7 +535,7 @@ class OpenAIService {
             }
             
             // Additional validation: try to decode with our expected structure
-            _ = try JSONDecoder().decode(OpenAINutritionResponse.self, from: jsonData)
+            _ = try decoder.decode(OpenAINutritionResponse.self, from: jsonData)
             return true
             
         } catch {
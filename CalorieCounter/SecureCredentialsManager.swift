@@ -2,7 +2,7 @@ import Foundation
 import Security
 
 /// Manager for securely storing and retrieving credentials using iOS Keychain
-class SecureCredentialsManager {
+final class SecureCredentialsManager {
     
     // MARK: - Constants
     
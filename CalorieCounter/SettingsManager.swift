@@ -3,18 +3,23 @@ import Combine
 
 /// Manager for app settings and configuration
 @MainActor
-class SettingsManager: ObservableObject {
+final class SettingsManager: ObservableObject {
     
     // MARK: - Published Properties
     
     @Published var isOpenAIConfigured: Bool = false
     @Published var openAIKeyStatus: String = "Not configured"
+    @Published var openAIModel: String = OpenAIService.defaultModel
     @Published var errorMessage: String?
     
+    /// UserDefaults key for the selected OpenAI model (not sensitive, so not kept in the Keychain)
+    nonisolated static let openAIModelDefaultsKey = "OpenAIModel"
+    
     // MARK: - Initialization
     
     init() {
         updateConfigurationStatus()
+        openAIModel = SettingsManager.storedOpenAIModel()
     }
     
     // MARK: - OpenAI Configuration
@@ -84,6 +89,43 @@ class SettingsManager: ObservableObject {
         }
     }
     
+    /// The model the user chose, or an empty string when the default model is in use
+    var customOpenAIModel: String {
+        openAIModel == OpenAIService.defaultModel ? "" : openAIModel
+    }
+    
+    /// Saves the OpenAI model used for food analysis
+    /// - Parameter model: The model name; an empty value or the default model's name clears
+    ///   the stored choice, so the app follows future changes to the default
+    func saveOpenAIModel(_ model: String) {
+        let trimmedModel = model.trimmingCharacters(in: .whitespacesAndNewlines)
+        
+        guard !trimmedModel.isEmpty, trimmedModel != OpenAIService.defaultModel else {
+            UserDefaults.standard.removeObject(forKey: SettingsManager.openAIModelDefaultsKey)
+            openAIModel = OpenAIService.defaultModel
+            errorMessage = nil
+            return
+        }
+        
+        guard !trimmedModel.contains(where: { $0.isWhitespace }) else {
+            errorMessage = "Invalid model name. Model names cannot contain spaces."
+            return
+        }
+        
+        UserDefaults.standard.set(trimmedModel, forKey: SettingsManager.openAIModelDefaultsKey)
+        openAIModel = trimmedModel
+        errorMessage = nil
+    }
+    
+    /// Returns the stored OpenAI model, or the default model if none has been chosen
+    /// - Returns: The model name to send with analysis requests
+    nonisolated static func storedOpenAIModel() -> String {
+        guard let model = UserDefaults.standard.string(forKey: openAIModelDefaultsKey), !model.isEmpty else {
+            return OpenAIService.defaultModel
+        }
+        return model
+    }
+    
     // MARK: - Configuration Status
     
     /// Updates the configuration status properties
@@ -109,13 +151,17 @@ class SettingsManager: ObservableObject {
     
     // MARK: - Configuration Export/Import (Future Enhancement)
     
+    /// Formatter for export timestamps, created once since formatters are expensive to build
+    private static let exportDateFormatter = ISO8601DateFormatter()
+    
     /// Exports configuration for backup (excludes sensitive data)
     /// - Returns: Configuration dictionary
     func exportConfiguration() -> [String: Any] {
         return [
             "version": "1.0",
             "hasOpenAIKey": isOpenAIConfigured,
-            "exportDate": ISO8601DateFormatter().string(from: Date())
+            "openAIModel": openAIModel,
+            "exportDate": SettingsManager.exportDateFormatter.string(from: Date())
         ]
     }
     
@@ -123,6 +169,8 @@ class SettingsManager: ObservableObject {
     func clearAllConfiguration() {
         do {
             try SecureCredentialsManager.deleteOpenAIAPIKey()
+            UserDefaults.standard.removeObject(forKey: SettingsManager.openAIModelDefaultsKey)
+            openAIModel = OpenAIService.defaultModel
             updateConfigurationStatus()
             errorMessage = nil
         } catch {
@@ -3,6 +3,8 @@ import SwiftUI
 struct SettingsView: View {
     @StateObject private var settingsManager = SettingsManager()
     @State private var apiKeyInput: String = ""
+    @State private var modelInput: String = ""
+    @State private var savedModelInput: String = ""
     @State private var showingAPIKeyInput = false
     @State private var showingDeleteConfirmation = false
     @State private var showingSuccessMessage = false
@@ -102,6 +104,31 @@ struct SettingsView: View {
                                         }
                                     }
                                 }
+                                
+                                Divider()
+                                
+                                // Model selection
+                                VStack(alignment: .leading, spacing: 8) {
+                                    Text("Model")
+                                        .font(.headline)
+                                        .fontWeight(.medium)
+                                    
+                                    TextField(OpenAIService.defaultModel, text: $modelInput)
+                                        .font(.system(.body, design: .monospaced))
+                                        .textInputAutocapitalization(.never)
+                                        .autocorrectionDisabled()
+                                        .padding(.horizontal, 12)
+                                        .padding(.vertical, 8)
+                                        .background(Color.gray.opacity(0.1))
+                                        .cornerRadius(6)
+                                        .onSubmit {
+                                            saveModelIfChanged()
+                                        }
+                                    
+                                    Text("Vision-capable model used for food analysis. Leave empty to use the default.")
+                                        .font(.caption)
+                                        .foregroundColor(.secondary)
+                                }
                             }
                         }
                         
@@ -168,11 +195,18 @@ struct SettingsView: View {
             .toolbar {
                 ToolbarItem(placement: .navigationBarTrailing) {
                     Button("Done") {
-                        dismiss()
+                        if saveModelIfChanged() {
+                            dismiss()
+                        }
                     }
                 }
             }
         }
+        .onAppear {
+            // Leave the field empty when the default is in use so its placeholder shows it
+            modelInput = settingsManager.customOpenAIModel
+            savedModelInput = modelInput
+        }
         .sheet(isPresented: $showingAPIKeyInput) {
             APIKeyInputView(
                 currentKey: settingsManager.getOpenAIAPIKey() ?? "",
@@ -198,6 +232,24 @@ struct SettingsView: View {
             Text("Your API key has been saved securely.")
         }
     }
+    
+    /// Saves the model field if it was edited since it was last loaded or saved
+    /// - Returns: false if the edited value was rejected
+    @discardableResult
+    private func saveModelIfChanged() -> Bool {
+        guard modelInput != savedModelInput else {
+            return true
+        }
+        
+        settingsManager.saveOpenAIModel(modelInput)
+        guard settingsManager.errorMessage == nil else {
+            return false
+        }
+        
+        modelInput = settingsManager.customOpenAIModel
+        savedModelInput = modelInput
+        return true
+    }
 }
 
 // MARK: - Supporting Views
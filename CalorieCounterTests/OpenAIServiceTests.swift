@@ -4,6 +4,25 @@ import XCTest
 /// Unit tests for OpenAI service integration
 final class OpenAIServiceTests: XCTestCase {
     
+    /// Nutrition reply split across several streamed deltas
+    private let salmonDeltas = [
+        "{\"protein\": 25.4, \"carbohydrates\": 0.0, ",
+        "\"fats\": 12.4, \"fiber\": 0.0, ",
+        "\"foodName\": \"Grilled Salmon Fillet\", \"confidence\": 0.89}"
+    ]
+    
+    override func setUp() {
+        super.setUp()
+        // Start every test with no cached replies and no queued stub responses
+        OpenAIService.clearResponseCache()
+        StubURLProtocol.reset()
+    }
+    
+    override func tearDown() {
+        StubURLProtocol.reset()
+        super.tearDown()
+    }
+    
     func testOpenAIServiceInitialization() {
         // Test that OpenAI service can be initialized with an API key
         let service = OpenAIService(apiKey: "test-key")
@@ -114,6 +133,46 @@ final class OpenAIServiceTests: XCTestCase {
         XCTAssertTrue(perfectJSON.contains("confidence"))
     }
     
+    func testFindJSONPatternsIgnoresStrayClosingBrace() {
+        // Test that a "}" in prose before the object does not hide the object
+        let service = OpenAIService(apiKey: "test-key")
+        let json = """
+        {"protein": 25.4, "carbohydrates": 0.0, "fats": 12.4, "fiber": 0.0, "foodName": "Salmon", "confidence": 0.89}
+        """
+        
+        let candidates = service.findJSONPatterns(in: "note: } \(json) done")
+        
+        XCTAssertEqual(candidates, [json])
+    }
+    
+    func testFindJSONPatternsReturnsOutermostObjects() {
+        // Test that nested braces are kept inside a single candidate
+        let service = OpenAIService(apiKey: "test-key")
+        
+        let candidates = service.findJSONPatterns(in: "a {\"x\": {\"y\": 1}} b {\"z\": 2}")
+        
+        XCTAssertEqual(candidates, ["{\"x\": {\"y\": 1}}", "{\"z\": 2}"])
+    }
+    
+    func testRetryDelayHonorsValidRetryAfter() {
+        // Test that a valid Retry-After value replaces the exponential backoff
+        let delay = OpenAIService.retryDelay(forAttempt: 0, response: makeHTTPResponse(retryAfter: "2"))
+        
+        XCTAssertGreaterThanOrEqual(delay, 2.0)
+        XCTAssertLessThanOrEqual(delay, 2.3)
+    }
+    
+    func testRetryDelayIgnoresInvalidRetryAfter() {
+        // Test that negative and non-finite Retry-After values fall back to backoff
+        for value in ["-1", "nan", "inf", "soon"] {
+            let delay = OpenAIService.retryDelay(forAttempt: 1, response: makeHTTPResponse(retryAfter: value))
+            
+            XCTAssertTrue(delay.isFinite, "Retry-After: \(value)")
+            XCTAssertGreaterThanOrEqual(delay, 1.0, "Retry-After: \(value)")
+            XCTAssertLessThanOrEqual(delay, 1.3, "Retry-After: \(value)")
+        }
+    }
+    
     func testNutritionDataWithNewConstants() {
         // Test that nutrition data calculation works with the new constants
         let nutritionData = NutritionData(
@@ -140,6 +199,174 @@ final class OpenAIServiceTests: XCTestCase {
         XCTAssertEqual(nutritionData.foodName, "Test Food")
     }
     
+    func testNutritionDataTotal() {
+        // Test that combining items sums each macro and recalculates calories
+        let chicken = NutritionData(protein: 31.0, carbohydrates: 0.0, fats: 3.6, fiber: 0.0, foodName: "Chicken")
+        let rice = NutritionData(protein: 5.0, carbohydrates: 45.0, fats: 1.8, fiber: 3.5, foodName: "Rice")
+        
+        let total = NutritionData.total(of: [chicken, rice], foodName: "Chicken and Rice")
+        
+        XCTAssertEqual(total.protein, 36.0, accuracy: 0.001)
+        XCTAssertEqual(total.carbohydrates, 45.0, accuracy: 0.001)
+        XCTAssertEqual(total.fats, 5.4, accuracy: 0.001)
+        XCTAssertEqual(total.fiber, 3.5, accuracy: 0.001)
+        XCTAssertEqual(total.calories, chicken.calories + rice.calories, accuracy: 0.1)
+        XCTAssertEqual(total.foodName, "Chicken and Rice")
+        
+        // An empty meal has no nutrition
+        XCTAssertEqual(NutritionData.total(of: []).calories, 0.0)
+    }
+    
+    func testNutritionDataAddition() {
+        // Test that adding two items sums each field
+        let eggs = NutritionData(protein: 13.0, carbohydrates: 1.1, fats: 11.0, fiber: 0.0, foodName: "Eggs")
+        let toast = NutritionData(protein: 3.0, carbohydrates: 14.0, fats: 1.0, fiber: 2.0, foodName: "Toast")
+        
+        let combined = eggs + toast
+        
+        XCTAssertEqual(combined.protein, 16.0, accuracy: 0.001)
+        XCTAssertEqual(combined.carbohydrates, 15.1, accuracy: 0.001)
+        XCTAssertEqual(combined.fats, 12.0, accuracy: 0.001)
+        XCTAssertEqual(combined.fiber, 2.0, accuracy: 0.001)
+        XCTAssertEqual(combined.calories, eggs.calories + toast.calories, accuracy: 0.1)
+        XCTAssertNil(combined.foodName)
+    }
+    
+    func testStreamingResponseIsParsed() async throws {
+        // Test that data lines are parsed, while comments and undecodable chunks are skipped
+        var body = Data(": keep-alive\n\n".utf8)
+        body.append(Data("data: not-json\n\n".utf8))
+        body.append(sseBody(salmonDeltas))
+        StubURLProtocol.enqueue(StubURLProtocol.Stub(statusCode: 200, body: body))
+        
+        let result = try await makeStubbedService().analyzeFood(image: createTestImage())
+        
+        assertSalmon(result)
+        XCTAssertEqual(StubURLProtocol.requestCount, 1)
+    }
+    
+    func testStreamingStopsAtFirstCompleteNutritionObject() async throws {
+        // Test that reading stops once the object is complete: this stream never finishes,
+        // so waiting for [DONE] or the end of the body would time out instead
+        StubURLProtocol.enqueue(StubURLProtocol.Stub(
+            statusCode: 200,
+            body: sseBody(salmonDeltas + [" Enjoy your meal!"], done: false),
+            finishesLoading: false
+        ))
+        
+        let result = try await makeStubbedService().analyzeFood(image: createTestImage())
+        
+        assertSalmon(result)
+    }
+    
+    func testStreamingWithoutContentThrowsEmptyResponse() async {
+        // Test that a stream ending before any content arrives is reported as empty
+        StubURLProtocol.enqueue(StubURLProtocol.Stub(statusCode: 200, body: sseBody([])))
+        
+        do {
+            _ = try await makeStubbedService().analyzeFood(image: createTestImage())
+            XCTFail("Expected an empty response error")
+        } catch OpenAIError.emptyResponse {
+            // Expected
+        } catch {
+            XCTFail("Unexpected error: \(error)")
+        }
+    }
+    
+    func testBufferedResponseIsParsed() async throws {
+        // Test the non-streaming path, including prose around the JSON
+        let content = "Here you go: " + salmonDeltas.joined() + " Enjoy!"
+        let reply = ["choices": [["message": ["content": content]]]]
+        let body = try JSONSerialization.data(withJSONObject: reply)
+        StubURLProtocol.enqueue(StubURLProtocol.Stub(statusCode: 200, body: body))
+        
+        let result = try await makeStubbedService(streamsResponses: false).analyzeFood(image: createTestImage())
+        
+        assertSalmon(result)
+    }
+    
+    func testRepeatedAnalysisIsServedFromCache() async throws {
+        // Test that analyzing the same image twice only reaches the API once
+        StubURLProtocol.enqueue(StubURLProtocol.Stub(statusCode: 200, body: sseBody(salmonDeltas)))
+        let service = makeStubbedService()
+        let image = createTestImage()
+        
+        let first = try await service.analyzeFood(image: image)
+        let second = try await service.analyzeFood(image: image)
+        
+        assertSalmon(first)
+        assertSalmon(second)
+        XCTAssertEqual(StubURLProtocol.requestCount, 1)
+    }
+    
+    func testRateLimitedRequestIsRetried() async throws {
+        // Test that a 429 is retried and the following success is used
+        StubURLProtocol.enqueue(StubURLProtocol.Stub(statusCode: 429, headers: ["Retry-After": "0"], body: Data()))
+        StubURLProtocol.enqueue(StubURLProtocol.Stub(statusCode: 200, body: sseBody(salmonDeltas)))
+        
+        let result = try await makeStubbedService().analyzeFood(image: createTestImage())
+        
+        assertSalmon(result)
+        XCTAssertEqual(StubURLProtocol.requestCount, 2)
+    }
+    
+    func testNonRetryableErrorIsReported() async {
+        // Test that a client error fails immediately with its status code
+        StubURLProtocol.enqueue(StubURLProtocol.Stub(statusCode: 401, body: Data()))
+        
+        do {
+            _ = try await makeStubbedService().analyzeFood(image: createTestImage())
+            XCTFail("Expected an API error")
+        } catch OpenAIError.apiError(let statusCode) {
+            XCTAssertEqual(statusCode, 401)
+            XCTAssertEqual(StubURLProtocol.requestCount, 1)
+        } catch {
+            XCTFail("Unexpected error: \(error)")
+        }
+    }
+    
+    private func makeStubbedService(streamsResponses: Bool = true) -> OpenAIService {
+        let configuration = URLSessionConfiguration.ephemeral
+        configuration.protocolClasses = [StubURLProtocol.self]
+        configuration.timeoutIntervalForRequest = 5
+        return OpenAIService(
+            apiKey: "test-key",
+            session: URLSession(configuration: configuration),
+            streamsResponses: streamsResponses
+        )
+    }
+    
+    /// Builds a server-sent event body with one chunk per content delta
+    private func sseBody(_ deltas: [String], done: Bool = true) -> Data {
+        var body = Data()
+        for delta in deltas {
+            let chunk = ["choices": [["delta": ["content": delta]]]]
+            body.append(Data("data: ".utf8))
+            body.append(try! JSONSerialization.data(withJSONObject: chunk))
+            body.append(Data("\n\n".utf8))
+        }
+        if done {
+            body.append(Data("data: [DONE]\n\n".utf8))
+        }
+        return body
+    }
+    
+    private func assertSalmon(_ result: FoodRecognitionResult, file: StaticString = #filePath, line: UInt = #line) {
+        XCTAssertEqual(result.recognizedFoodName, "Grilled Salmon Fillet", file: file, line: line)
+        XCTAssertEqual(result.confidence, 0.89, accuracy: 0.001, file: file, line: line)
+        XCTAssertEqual(result.nutritionData.protein, 25.4, accuracy: 0.001, file: file, line: line)
+        XCTAssertEqual(result.nutritionData.fats, 12.4, accuracy: 0.001, file: file, line: line)
+    }
+    
+    private func makeHTTPResponse(retryAfter: String) -> HTTPURLResponse {
+        HTTPURLResponse(
+            url: URL(string: "https://api.openai.com/v1/chat/completions")!,
+            statusCode: 429,
+            httpVersion: "HTTP/1.1",
+            headerFields: ["Retry-After": retryAfter]
+        )!
+    }
+    
     private func createTestImage() -> UIImage {
         // Create a simple 1x1 pixel image for testing
         let size = CGSize(width: 1, height: 1)
@@ -151,4 +378,82 @@ final class OpenAIServiceTests: XCTestCase {
         UIGraphicsEndImageContext()
         return image
     }
+}
+
+/// URLProtocol that answers requests with queued canned responses, so OpenAIService can be
+/// exercised end to end without reaching the network
+final class StubURLProtocol: URLProtocol {
+    struct Stub {
+        let statusCode: Int
+        var headers: [String: String] = [:]
+        let body: Data
+        /// When false the response stays open after the body, like a stream that never ends
+        var finishesLoading = true
+    }
+    
+    private static let lock = NSLock()
+    private static var stubs: [Stub] = []
+    private static var postCount = 0
+    
+    /// Number of API requests received, excluding connection warm-up requests
+    static var requestCount: Int {
+        lock.withLock { postCount }
+    }
+    
+    static func enqueue(_ stub: Stub) {
+        lock.withLock { stubs.append(stub) }
+    }
+    
+    static func reset() {
+        lock.withLock {
+            stubs = []
+            postCount = 0
+        }
+    }
+    
+    override class func canInit(with request: URLRequest) -> Bool {
+        true
+    }
+    
+    override class func canonicalRequest(for request: URLRequest) -> URLRequest {
+        request
+    }
+    
+    override func startLoading() {
+        // Answer connection warm-up requests without consuming a queued response
+        guard request.httpMethod != "HEAD" else {
+            respond(with: Stub(statusCode: 200, body: Data()))
+            return
+        }
+        
+        let stub = Self.lock.withLock { () -> Stub? in
+            Self.postCount += 1
+            return Self.stubs.isEmpty ? nil : Self.stubs.removeFirst()
+        }
+        
+        guard let stub = stub else {
+            client?.urlProtocol(self, didFailWithError: URLError(.resourceUnavailable))
+            return
+        }
+        
+        respond(with: stub)
+    }
+    
+    override func stopLoading() {}
+    
+    private func respond(with stub: Stub) {
+        let response = HTTPURLResponse(
+            url: request.url!,
+            statusCode: stub.statusCode,
+            httpVersion: "HTTP/1.1",
+            headerFields: stub.headers
+        )!
+        
+        client?.urlProtocol(self, didReceive: response, cacheStoragePolicy: .notAllowed)
+        client?.urlProtocol(self, didLoad: stub.body)
+        
+        if stub.finishesLoading {
+            client?.urlProtocolDidFinishLoading(self)
+        }
+    }
 }
\ No newline at end of file
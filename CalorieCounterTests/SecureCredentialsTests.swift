@@ -8,11 +8,13 @@ final class SecureCredentialsTests: XCTestCase {
         super.setUp()
         // Clean up any existing test keys
         try? SecureCredentialsManager.deleteOpenAIAPIKey()
+        UserDefaults.standard.removeObject(forKey: SettingsManager.openAIModelDefaultsKey)
     }
     
     override func tearDown() {
         // Clean up after tests
         try? SecureCredentialsManager.deleteOpenAIAPIKey()
+        UserDefaults.standard.removeObject(forKey: SettingsManager.openAIModelDefaultsKey)
         super.tearDown()
     }
     
@@ -185,4 +187,43 @@ final class SecureCredentialsTests: XCTestCase {
         XCTAssertFalse(settingsManager.isOpenAIConfigured)
         XCTAssertEqual(settingsManager.openAIKeyStatus, "Not configured")
     }
+    
+    @MainActor
+    func testSaveOpenAIModel() {
+        let settingsManager = SettingsManager()
+        
+        // Defaults to the built-in model
+        XCTAssertEqual(settingsManager.openAIModel, OpenAIService.defaultModel)
+        XCTAssertEqual(SettingsManager.storedOpenAIModel(), OpenAIService.defaultModel)
+        
+        // A saved model is used for analysis requests
+        settingsManager.saveOpenAIModel("  gpt-4o-mini ")
+        XCTAssertNil(settingsManager.errorMessage)
+        XCTAssertEqual(settingsManager.openAIModel, "gpt-4o-mini")
+        XCTAssertEqual(SettingsManager.storedOpenAIModel(), "gpt-4o-mini")
+        
+        // An empty value restores the default
+        settingsManager.saveOpenAIModel("")
+        XCTAssertEqual(settingsManager.openAIModel, OpenAIService.defaultModel)
+        XCTAssertEqual(SettingsManager.storedOpenAIModel(), OpenAIService.defaultModel)
+        XCTAssertNil(UserDefaults.standard.object(forKey: SettingsManager.openAIModelDefaultsKey))
+        
+        // Saving the default model's name stores nothing, so future default changes apply
+        settingsManager.saveOpenAIModel("gpt-4o-mini")
+        settingsManager.saveOpenAIModel(OpenAIService.defaultModel)
+        XCTAssertNil(settingsManager.errorMessage)
+        XCTAssertEqual(settingsManager.openAIModel, OpenAIService.defaultModel)
+        XCTAssertEqual(settingsManager.customOpenAIModel, "")
+        XCTAssertNil(UserDefaults.standard.object(forKey: SettingsManager.openAIModelDefaultsKey))
+    }
+    
+    @MainActor
+    func testSaveOpenAIModelRejectsInvalidName() {
+        let settingsManager = SettingsManager()
+        
+        settingsManager.saveOpenAIModel("gpt 4o")
+        
+        XCTAssertNotNil(settingsManager.errorMessage)
+        XCTAssertEqual(SettingsManager.storedOpenAIModel(), OpenAIService.defaultModel)
+    }
 }
\ No newline at end of file